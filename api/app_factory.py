@@ -0,0 +1,42 @@
+from fastapi import FastAPI
+from fastapi.openapi.docs import get_swagger_ui_html
+from fastapi.responses import HTMLResponse, ORJSONResponse
+
+from slowapi import _rate_limit_exceeded_handler
+from slowapi.errors import RateLimitExceeded
+
+from api.ratelimit import limiter
+
+
+def make_app(title: str, description: str, schema_url: str, **kwargs) -> FastAPI:
+    """Builds a playground sub-API wired to the shared rate limiter.
+
+    `schema_url` is where the app's openapi.json is served once mounted,
+    e.g. "/contact/openapi.json". Extra kwargs go straight to FastAPI.
+    """
+    app = FastAPI(
+        title=title,
+        description=description,
+        docs_url=None,
+        default_response_class=ORJSONResponse,
+        **kwargs,
+    )
+    # Limiter requires the request to be in the args for your routes!
+    app.state.limiter = limiter
+    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+    swagger_html = get_swagger_ui_html(
+        title=f"4Geeks Playground - {title}",
+        openapi_url=schema_url,
+        swagger_favicon_url="/favicon.ico",
+        # swagger_css_url="/static/swagger-ui.css",
+    ).body
+
+    @app.get("/docs", include_in_schema=False)
+    async def swagger_ui_html():
+        return HTMLResponse(
+            content=swagger_html,
+            headers={"Cache-Control": "public, max-age=3600, immutable"},
+        )
+
+    return app
@@ -1,33 +1,35 @@
 from typing import List, Optional, Annotated
 
+from cachetools import TTLCache
 from fastapi import (
-    FastAPI, Request, Response, HTTPException,
+    Request, Response,
     Query, Depends, Path, status,
 )
 from fastapi.exception_handlers import request_validation_exception_handler
 from fastapi.exceptions import RequestValidationError
-from fastapi.openapi.docs import get_swagger_ui_html
-from pydantic import ValidationError
+from pydantic import TypeAdapter, ValidationError
 
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-
-from sqlmodel import (
-    Session, select
-)
+from sqlalchemy import String, bindparam, delete, update
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from api.contact.models import (
     Agenda, AgendaRead,
     Contact, ContactCreate, ContactRead, ContactUpdate,
     AgendaList, ContactList, AgendaReadWithItems,
 )
-from api.db import get_session
+from api.app_factory import make_app
+from api.db import get_session, insert
+from api.ratelimit import limiter
+from api.serializers import (
+    body_response, error_response, json_body, json_response,
+)
 
-app = FastAPI(
+app = make_app(
     title="Contact List API",
     description="An API for storing contacts.",
-    docs_url=None,
+    schema_url="/contact/openapi.json",
     openapi_tags=[
         {
             "name": "Agenda operations",
@@ -40,10 +42,63 @@ app = FastAPI(
     ]
 )
 
-limiter = Limiter(key_func=get_remote_address)
-# Limiter requires the request to be in the args for your routes!
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+AGENDA_ADAPTER = TypeAdapter(AgendaRead)
+AGENDA_LIST_ADAPTER = TypeAdapter(AgendaList)
+AGENDA_WITH_ITEMS_ADAPTER = TypeAdapter(AgendaReadWithItems)
+CONTACT_ADAPTER = TypeAdapter(ContactRead)
+CONTACT_LIST_ADAPTER = TypeAdapter(ContactList)
+
+# Encoded GET bodies; mutating routes evict them.
+AGENDA_CACHE = TTLCache(maxsize=10_000, ttl=2.0)
+AGENDA_LIST_CACHE = TTLCache(maxsize=1_000, ttl=2.0)
+
+# Lists select plain columns; the rows are encoded straight to JSON.
+AGENDAS_PAGE = select(Agenda.id, Agenda.slug).offset(
+    bindparam("offset")
+).limit(bindparam("limit"))
+AGENDA_BY_SLUG = select(Agenda).where(
+    Agenda.slug == bindparam("slug")
+)
+AGENDA_WITH_CONTACTS_BY_SLUG = AGENDA_BY_SLUG.options(
+    selectinload(Agenda.contacts)
+)
+INSERT_AGENDA = insert(Agenda).values(
+    slug=bindparam("slug")
+).on_conflict_do_nothing(
+    index_elements=["slug"]
+).returning(Agenda)
+# No row comes back when the agenda doesn't exist.
+INSERT_AGENDA_CONTACT = insert(Contact).from_select(
+    ["name", "phone", "email", "address", "agenda_id"],
+    select(
+        bindparam("name", type_=String),
+        bindparam("phone", type_=String),
+        bindparam("email", type_=String),
+        bindparam("address", type_=String),
+        Agenda.id,
+    ).where(Agenda.slug == bindparam("slug")),
+).returning(Contact).execution_options(dml_strategy="raw")
+# A contact by id, only if it belongs to the agenda with the given slug.
+IN_AGENDA = (
+    Contact.id == bindparam("contact_id"),
+    Contact.agenda_id.in_(
+        select(Agenda.id).where(Agenda.slug == bindparam("slug"))
+    ),
+)
+AGENDA_CONTACT = select(Contact).where(*IN_AGENDA)
+# "core_only" returns the updated row, not the session's possibly stale copy.
+UPDATE_AGENDA_CONTACT = update(Contact).where(
+    *IN_AGENDA
+).returning(Contact).execution_options(dml_strategy="core_only")
+# Bulk deletes skip the ORM cascade, so children go first.
+DELETE_AGENDA_CONTACTS = delete(Contact).where(
+    Contact.agenda_id.in_(
+        select(Agenda.id).where(Agenda.slug == bindparam("slug"))
+    )
+).execution_options(synchronize_session="fetch")
+DELETE_AGENDA = delete(Agenda).where(
+    Agenda.slug == bindparam("slug")
+).returning(Agenda.id).execution_options(synchronize_session="fetch")
 
 
 @app.exception_handler(RequestValidationError)
@@ -51,16 +106,6 @@ async def validation_exception_handler(request, exc):
     return await request_validation_exception_handler(request, exc)
 
 
-@app.get("/docs", include_in_schema=False)
-async def swagger_ui_html():
-    return get_swagger_ui_html(
-        title="4Geeks Playground - Contact List API",
-        openapi_url="/contact/openapi.json",
-        swagger_favicon_url="/favicon.ico",
-        # swagger_css_url="/static/swagger-ui.css",
-    )
-
-
 @app.get(
     "/agendas",
     response_model=AgendaList,
@@ -69,17 +114,21 @@ async def swagger_ui_html():
     description="Gets all Agendas from the database.",
 )
 @limiter.limit("120/minute")
-def read_agendas(
+async def read_agendas(
     request: Request,
     offset: int = 0,
     limit: int = Query(default=100, le=100),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
-    return {
-        "agendas": session.exec(
-            select(Agenda).offset(offset).limit(limit)
-        ).all()
-    }
+    key = (offset, limit)
+    if (body := AGENDA_LIST_CACHE.get(key)) is None:
+        body = AGENDA_LIST_CACHE[key] = json_body(AGENDA_LIST_ADAPTER, {
+            "agendas": (await session.exec(
+                AGENDAS_PAGE,
+                params={"offset": offset, "limit": limit},
+            )).all()
+        })
+    return body_response(body)
 
 
 @app.get(
@@ -90,20 +139,25 @@ def read_agendas(
     description="Gets a specific Agenda from the database.",
 )
 @limiter.limit("120/minute")
-def read_agenda(
+async def read_agenda(
     request: Request,
     slug: Annotated[str, Path(title="slug")],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
-    agenda = session.exec(select(Agenda).where(
-        Agenda.slug == slug)
-    ).first()
-    if agenda:
-        return agenda
-    raise HTTPException(
-        status_code=status.HTTP_404_NOT_FOUND,
-        detail=f"""Agenda "{slug}" doesn't exist."""
-    )
+    if (body := AGENDA_CACHE.get(slug)) is None:
+        agenda = (await session.exec(
+            AGENDA_WITH_CONTACTS_BY_SLUG,
+            params={"slug": slug},
+        )).first()
+        if not agenda:
+            return error_response(
+                status.HTTP_404_NOT_FOUND,
+                f"""Agenda "{slug}" doesn't exist."""
+            )
+        body = AGENDA_CACHE[slug] = json_body(
+            AGENDA_WITH_ITEMS_ADAPTER, agenda
+        )
+    return body_response(body)
 
 
 @app.post(
@@ -115,23 +169,26 @@ def read_agenda(
     description="Creates an Agenda in the database.",
 )
 @limiter.limit("15/minute")
-def create_agenda(
+async def create_agenda(
     request: Request,
     slug: Annotated[str, Path(title="slug")],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ) -> None:
-    user_exists = session.exec(select(Agenda).where(
-        Agenda.slug == slug)).first()
-    if user_exists:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"""Agenda "{slug}" already exists."""
+    db_agenda = (await session.exec(
+        INSERT_AGENDA,
+        params={"slug": slug},
+    )).scalar_one_or_none()
+    if db_agenda is None:
+        return error_response(
+            status.HTTP_400_BAD_REQUEST,
+            f"""Agenda "{slug}" already exists."""
         )
-    db_user = Agenda(slug=slug)
-    session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
-    return db_user
+    await session.commit()
+    AGENDA_CACHE.pop(slug, None)
+    AGENDA_LIST_CACHE.clear()
+    return json_response(
+        AGENDA_ADAPTER, db_agenda, status.HTTP_201_CREATED
+    )
 
 
 @app.delete(
@@ -141,24 +198,27 @@ def create_agenda(
     description="Deletes a specific Agenda from the database.",
 )
 @limiter.limit("15/minute")
-def delete_agenda(
+async def delete_agenda(
     request: Request,
     slug: Annotated[str, Path(title="slug")],
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
     tags=["Agenda operations"],
     summary="Delete Agenda.",
     description="Deletes a specific agenda from the database.",
 ):
-    user = session.exec(select(Agenda).where(
-        Agenda.slug == slug)
-    ).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"""Agenda "{slug}" doesn't exist."""
+    await session.exec(DELETE_AGENDA_CONTACTS, params={"slug": slug})
+    deleted = (await session.exec(
+        DELETE_AGENDA,
+        params={"slug": slug},
+    )).first()
+    if deleted is None:
+        return error_response(
+            status.HTTP_400_BAD_REQUEST,
+            f"""Agenda "{slug}" doesn't exist."""
         )
-    session.delete(user)
-    session.commit()
+    await session.commit()
+    AGENDA_CACHE.pop(slug, None)
+    AGENDA_LIST_CACHE.clear()
     return Response(
         status_code=status.HTTP_204_NO_CONTENT
     )
@@ -172,22 +232,23 @@ def delete_agenda(
     description="Gets the contacts from a specific agenda from the database.",
 )
 @limiter.limit("60/minute")
-def read_agenda_contacts(
+async def read_agenda_contacts(
     request: Request,
     slug: Annotated[str, Path(title="slug")],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
-    agenda = session.exec(select(Agenda).where(
-        Agenda.slug == slug)
-    ).first()
+    agenda = (await session.exec(
+        AGENDA_WITH_CONTACTS_BY_SLUG,
+        params={"slug": slug},
+    )).first()
     if not agenda:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"""Agenda "{slug}" doesn't exist."""
+        return error_response(
+            status.HTTP_404_NOT_FOUND,
+            f"""Agenda "{slug}" doesn't exist."""
         )
-    return ContactList(
-        contacts=agenda.contacts
-    )
+    return json_response(CONTACT_LIST_ADAPTER, {
+        "contacts": agenda.contacts
+    })
 
 
 @app.post(
@@ -199,31 +260,32 @@ def read_agenda_contacts(
     description="Creates a Contact for an Agenda.",
 )
 @limiter.limit("60/minute")
-def create_agenda_contact(
+async def create_agenda_contact(
     request: Request,
     slug: Annotated[str, Path(title="slug")],
     contact: ContactCreate,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
-    agenda = session.exec(select(Agenda).where(
-        Agenda.slug == slug)
-    ).first()
-    if not agenda:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"""Agenda "{slug}" doesn't exist."""
+    db_contact = (await session.exec(
+        INSERT_AGENDA_CONTACT,
+        params={
+            "name": contact.name,
+            "phone": contact.phone or "",
+            "email": contact.email or "",
+            "address": contact.address or "",
+            "slug": slug,
+        },
+    )).first()
+    if db_contact is None:
+        return error_response(
+            status.HTTP_404_NOT_FOUND,
+            f"""Agenda "{slug}" doesn't exist."""
         )
-    db_contact = Contact.model_validate({
-        "name": contact.name,
-        "phone": contact.phone or "",
-        "email": contact.email or "",
-        "address": contact.address or "",
-        "agenda_id": agenda.id,
-    })
-    session.add(db_contact)
-    session.commit()
-    session.refresh(db_contact)
-    return db_contact
+    await session.commit()
+    AGENDA_CACHE.pop(slug, None)
+    return json_response(
+        CONTACT_ADAPTER, db_contact, status.HTTP_201_CREATED
+    )
 
 
 @app.put(
@@ -234,34 +296,38 @@ def create_agenda_contact(
     description="Atomically (piece-by-piece) updates a Contact on an Agenda.",
 )
 @limiter.limit("60/minute")
-def update_agenda_contact(
+async def update_agenda_contact(
     request: Request,
     slug: Annotated[str, Path(title="slug")],
     contact_id: Annotated[int, Path(title="contact id")],
     contact: ContactUpdate,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
-    db_contact = session.get(
-        Contact,
-        contact_id
-    )
-    if not db_contact:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"""Contact #{contact.id} doesn't exist."""
-        )
-    if slug != db_contact.agenda.slug:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"""Contact #{contact.id} doesn't exist in Agenda "{slug}"."""
+    changes = contact.model_dump(exclude_unset=True, exclude_none=True)
+    params = {"contact_id": contact_id, "slug": slug}
+    if changes:
+        db_contact = (await session.exec(
+            UPDATE_AGENDA_CONTACT.values(**changes),
+            params=params,
+        )).first()
+    else:
+        db_contact = (await session.exec(
+            AGENDA_CONTACT,
+            params=params,
+        )).first()
+    if db_contact is None:
+        if await session.get(Contact, contact_id) is None:
+            return error_response(
+                status.HTTP_404_NOT_FOUND,
+                f"""Contact #{contact_id} doesn't exist."""
+            )
+        return error_response(
+            status.HTTP_404_NOT_FOUND,
+            f"""Contact #{contact_id} doesn't exist in Agenda "{slug}"."""
         )
-    for k, v in contact:
-        if v is not None:
-            setattr(db_contact, k, v)
-    session.add(db_contact)
-    session.commit()
-    session.refresh(db_contact)
-    return db_contact
+    await session.commit()
+    AGENDA_CACHE.pop(slug, None)
+    return json_response(CONTACT_ADAPTER, db_contact)
 
 
 @app.delete(
@@ -271,25 +337,27 @@ def update_agenda_contact(
     description="Deletes a specific Contact on an Agenda.",
 )
 @limiter.limit("120/minute")
-def delete_agenda_contact(
+async def delete_agenda_contact(
     request: Request,
     slug: Annotated[str, Path(title="slug")],
     contact_id: Annotated[int, Path(title="contact id")],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
-    db_contact = session.get(Contact, contact_id)
+    db_contact = await session.get(Contact, contact_id)
     if not db_contact:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"""Contact #{db_contact.id} doesn't exist."""
+        return error_response(
+            status.HTTP_404_NOT_FOUND,
+            f"""Contact #{contact_id} doesn't exist."""
         )
+    await session.refresh(db_contact, ["agenda"])
     if db_contact.agenda.slug != slug:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"""Contact #{db_contact.id} doesn't exist in Agenda "{slug}"."""
+        return error_response(
+            status.HTTP_404_NOT_FOUND,
+            f"""Contact #{contact_id} doesn't exist in Agenda "{slug}"."""
         )
-    session.delete(db_contact)
-    session.commit()
+    await session.delete(db_contact)
+    await session.commit()
+    AGENDA_CACHE.pop(slug, None)
     return Response(
         status_code=status.HTTP_204_NO_CONTENT
     )
@@ -7,6 +7,8 @@ from pydantic import (
     BaseModel
 )
 
+from api.serializers import READ_CONFIG
+
 
 class AgendaBase(SQLModel):
     slug: str = Field(
@@ -31,6 +33,8 @@ class Agenda(AgendaBase, table=True):
 
 
 class AgendaRead(AgendaBase):
+    model_config = READ_CONFIG
+
     id: int
     slug: str
 
@@ -48,12 +52,15 @@ class Contact(ContactBase, table=True):
         primary_key=True,
     )
     agenda_id: int = Field(
-        foreign_key="agenda.id"
+        foreign_key="agenda.id",
+        index=True,
     )
     agenda: Optional["Agenda"] = Relationship(back_populates="contacts")
 
 
 class ContactRead(ContactBase):
+    model_config = READ_CONFIG
+
     id: int
     name: str
     phone: str
@@ -78,14 +85,20 @@ class ContactUpdate(ContactBase):
 # Models with relationships
 
 class AgendaReadWithItems(AgendaBase):
+    model_config = READ_CONFIG
+
     contacts: List["ContactRead"]
 
 
 # Group models
 
 class AgendaList(BaseModel):
+    model_config = READ_CONFIG
+
     agendas: List["AgendaRead"]
 
 
 class ContactList(BaseModel):
+    model_config = READ_CONFIG
+
     contacts: List["ContactRead"]
@@ -1,40 +1,54 @@
 import pytest
-from fastapi.testclient import TestClient
-from sqlmodel import (
-    Session, SQLModel, create_engine, select
-)
+from httpx import ASGITransport, AsyncClient
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.pool import StaticPool
 
 from api.db import get_session
-from api.contact.app import app
+from api.ratelimit import limiter
+from api.contact.app import app, AGENDA_CACHE, AGENDA_LIST_CACHE
 from api.contact.models import (
     Agenda, Contact
 )
 
 
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
 @pytest.fixture(name="session")
-def session_fixture():
-    engine = create_engine(
-        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+async def session_fixture():
+    engine = create_async_engine(
+        "sqlite+aiosqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
     )
-    SQLModel.metadata.create_all(engine)
-    with Session(engine) as session:
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
         yield session
+    await engine.dispose()
 
 
 @pytest.fixture(name="client")
-def client_fixture(session: Session):
+async def client_fixture(session: AsyncSession):
     def get_session_override():
         return session
 
     app.dependency_overrides[get_session] = get_session_override
-    client = TestClient(app)
-    yield client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        yield client
     app.dependency_overrides.clear()
+    AGENDA_CACHE.clear()
+    AGENDA_LIST_CACHE.clear()
+    limiter.reset()
 
 
-def test_create_agenda(client: TestClient):
-    response = client.post(
+async def test_create_agenda(client: AsyncClient):
+    response = await client.post(
         "/agendas/grizelle"
     )
     data = response.json()
@@ -44,16 +58,30 @@ def test_create_agenda(client: TestClient):
     assert data["id"] is not None
 
 
-def test_get_agendas(session: Session, client: TestClient):
+async def test_create_agenda_exists(session: AsyncSession, client: AsyncClient):
+    session.add(Agenda(slug="grizelle"))
+    await session.commit()
+
+    response = await client.post(
+        "/agendas/grizelle"
+    )
+    agendas = (await session.exec(select(Agenda))).all()
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": 'Agenda "grizelle" already exists.'}
+    assert len(agendas) == 1
+
+
+async def test_get_agendas(session: AsyncSession, client: AsyncClient):
     agendas = [
         Agenda(slug="grizelle"),
         Agenda(slug="sombra"),
     ]
     for agenda in agendas:
         session.add(agenda)
-    session.commit()
+    await session.commit()
 
-    resp = client.get(
+    resp = await client.get(
         "/agendas"
     )
     data = resp.json()
@@ -65,12 +93,44 @@ def test_get_agendas(session: Session, client: TestClient):
     assert "sombra" in [agenda["slug"] for agenda in data["agendas"]]
 
 
-def test_post_contacts(session: Session, client: TestClient):
+async def test_get_agenda(session: AsyncSession, client: AsyncClient):
+    sombra = Agenda(slug="sombra")
+    session.add(sombra)
+    await session.commit()
+    session.add(Contact(name="Grizelle", agenda_id=sombra.id))
+    await session.commit()
+
+    resp = await client.get(
+        "/agendas/sombra"
+    )
+    data = resp.json()
+
+    assert resp.status_code == 200
+    assert data["slug"] == "sombra"
+    assert len(data["contacts"]) == 1
+    assert data["contacts"][0]["name"] == "Grizelle"
+
+    resp = await client.post(
+        "/agendas/sombra/contacts",
+        json={
+            "name": "Nekobasu"
+        }
+    )
+    # The app shares this session; drop what the first GET loaded.
+    session.expire_all()
+    resp = await client.get(
+        "/agendas/sombra"
+    )
+
+    assert len(resp.json()["contacts"]) == 2
+
+
+async def test_post_contacts(session: AsyncSession, client: AsyncClient):
     sombra = Agenda(slug="sombra")
     session.add(sombra)
-    session.commit()
+    await session.commit()
 
-    resp = client.post(
+    resp = await client.post(
         "/agendas/sombra/contacts",
         json={
             "name": "Grizelle",
@@ -81,9 +141,10 @@ def test_post_contacts(session: Session, client: TestClient):
     )
     data = resp.json()
 
-    sombra = session.exec(select(Agenda).where(
+    sombra = (await session.exec(select(Agenda).where(
         Agenda.slug == "sombra")
-    ).first()
+    )).first()
+    await session.refresh(sombra, ["contacts"])
 
     assert resp.status_code == 201
     assert len(sombra.contacts) == 1
@@ -92,7 +153,7 @@ def test_post_contacts(session: Session, client: TestClient):
     assert data["email"] == "grizelle@catemail.com"
     assert data["address"] == "123 Nonesuch Pl, Catington CA"
 
-    resp = client.post(
+    resp = await client.post(
         "/agendas/sombra/contacts",
         json={
             "name": "Nekobasu"
@@ -100,18 +161,19 @@ def test_post_contacts(session: Session, client: TestClient):
     )
     data = resp.json()
 
-    sombra = session.exec(select(Agenda).where(
+    sombra = (await session.exec(select(Agenda).where(
         Agenda.slug == "sombra")
-    ).first()
+    )).first()
+    await session.refresh(sombra, ["contacts"])
 
     assert resp.status_code == 201
     assert len(sombra.contacts) == 2
 
 
-def test_put_contact(session: Session, client: TestClient):
+async def test_put_contact(session: AsyncSession, client: AsyncClient):
     sombra = Agenda(slug="sombra")
     session.add(sombra)
-    session.commit()
+    await session.commit()
 
     grizelle = Contact(
         name="Oops, no data!",
@@ -121,10 +183,10 @@ def test_put_contact(session: Session, client: TestClient):
         agenda_id=sombra.id
     )
     session.add(grizelle)
-    session.commit()
-    session.refresh(grizelle)
+    await session.commit()
+    await session.refresh(grizelle)
 
-    resp = client.put(
+    resp = await client.put(
         f"/agendas/sombra/contacts/{grizelle.id}",
         json={
             "name": "Grizzle",
@@ -135,9 +197,10 @@ def test_put_contact(session: Session, client: TestClient):
     )
     data = resp.json()
 
-    sombra = session.exec(select(Agenda).where(
+    sombra = (await session.exec(select(Agenda).where(
         Agenda.slug == "sombra")
-    ).first()
+    )).first()
+    await session.refresh(sombra, ["contacts"])
 
     assert resp.status_code == 200
     assert len(sombra.contacts) == 1
@@ -146,7 +209,7 @@ def test_put_contact(session: Session, client: TestClient):
     assert data["email"] == "grizelle@catemail.com"
     assert data["address"] == "123 Nonesuch Pl, Catington CA"
 
-    resp = client.put(
+    resp = await client.put(
         f"/agendas/sombra/contacts/{grizelle.id}",
         json={
             "name": "Grizelle"
@@ -154,9 +217,10 @@ def test_put_contact(session: Session, client: TestClient):
     )
     data = resp.json()
 
-    sombra = session.exec(select(Agenda).where(
+    sombra = (await session.exec(select(Agenda).where(
         Agenda.slug == "sombra")
-    ).first()
+    )).first()
+    await session.refresh(sombra, ["contacts"])
 
     assert resp.status_code == 200
     assert len(sombra.contacts) == 1
@@ -166,10 +230,45 @@ def test_put_contact(session: Session, client: TestClient):
     assert data["address"] == "123 Nonesuch Pl, Catington CA"
 
 
-def test_delete_contacts(session: Session, client: TestClient):
+async def test_put_contact_wrong_agenda(session: AsyncSession, client: AsyncClient):
     sombra = Agenda(slug="sombra")
     session.add(sombra)
-    session.commit()
+    session.add(Agenda(slug="test"))
+    await session.commit()
+
+    grizelle = Contact(name="Grizelle", agenda_id=sombra.id)
+    session.add(grizelle)
+    await session.commit()
+
+    resp = await client.put(
+        f"/agendas/test/contacts/{grizelle.id}",
+        json={"name": "Grizzle"}
+    )
+    await session.refresh(grizelle)
+
+    assert resp.status_code == 404
+    assert resp.json()["detail"] == (
+        f'''Contact #{grizelle.id} doesn't exist in Agenda "test".'''
+    )
+    assert grizelle.name == "Grizelle"
+
+
+async def test_put_contact_missing(session: AsyncSession, client: AsyncClient):
+    session.add(Agenda(slug="sombra"))
+    await session.commit()
+
+    resp = await client.put(
+        "/agendas/sombra/contacts/999",
+        json={"name": "Grizzle"}
+    )
+
+    assert resp.status_code == 404
+    assert resp.json()["detail"] == "Contact #999 doesn't exist."
+
+async def test_delete_contacts(session: AsyncSession, client: AsyncClient):
+    sombra = Agenda(slug="sombra")
+    session.add(sombra)
+    await session.commit()
 
     grizelle = Contact(
         name="Oops, no data!",
@@ -179,29 +278,30 @@ def test_delete_contacts(session: Session, client: TestClient):
         agenda_id=sombra.id
     )
     session.add(grizelle)
-    session.commit()
-    session.refresh(grizelle)
+    await session.commit()
+    await session.refresh(grizelle)
 
-    resp = client.delete(
+    resp = await client.delete(
         f"/agendas/sombra/contacts/{grizelle.id}",
     )
 
-    sombra = session.exec(select(Agenda).where(
+    sombra = (await session.exec(select(Agenda).where(
         Agenda.slug == "sombra")
-    ).first()
+    )).first()
+    await session.refresh(sombra, ["contacts"])
 
     assert resp.status_code == 204
     assert len(sombra.contacts) == 0
 
 
-def test_delete_agenda(session: Session, client: TestClient):
+async def test_delete_agenda(session: AsyncSession, client: AsyncClient):
     sombra = Agenda(slug="sombra")
     session.add(sombra)
-    session.commit()
-    session.refresh(sombra)
+    await session.commit()
+    await session.refresh(sombra)
 
     session.add(Agenda(slug="test"))
-    session.commit()
+    await session.commit()
 
     grizelle = Contact(
         name="Oops, no data!",
@@ -211,18 +311,44 @@ def test_delete_agenda(session: Session, client: TestClient):
         agenda_id=sombra.id
     )
     session.add(grizelle)
-    session.commit()
-    session.refresh(grizelle)
+    await session.commit()
+    await session.refresh(grizelle)
 
-    resp = client.delete(
+    resp = await client.delete(
         f"/agendas/sombra",
     )
 
-    sombra = session.get(Agenda, sombra.id)
-    grizelle = session.get(Contact, grizelle.id)
-    agendas = session.exec(select(Agenda)).all()
+    sombra = await session.get(Agenda, sombra.id)
+    grizelle = await session.get(Contact, grizelle.id)
+    agendas = (await session.exec(select(Agenda))).all()
 
     assert resp.status_code == 204
     assert sombra is None
     assert grizelle is None
     assert len(agendas) == 1
+
+
+async def test_delete_agenda_missing(session: AsyncSession, client: AsyncClient):
+    sombra = Agenda(slug="sombra")
+    session.add(sombra)
+    await session.commit()
+
+    session.add(Contact(name="Grizelle", agenda_id=sombra.id))
+    await session.commit()
+
+    resp = await client.delete("/agendas/missing")
+    contacts = (await session.exec(select(Contact))).all()
+
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == 'Agenda "missing" doesn\'t exist.'
+    assert len(contacts) == 1
+    assert contacts[0].agenda_id == sombra.id
+
+async def test_create_agenda_rate_limited(client: AsyncClient):
+    for _ in range(15):
+        response = await client.post("/agendas/grizelle")
+        assert response.status_code != 429
+
+    response = await client.post("/agendas/grizelle")
+
+    assert response.status_code == 429
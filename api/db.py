@@ -1,14 +1,66 @@
 import os
+from uuid import uuid4
 
-from sqlmodel import (
-    Session, create_engine
-)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+DB_URL = os.getenv("DB_URL", "sqlite+aiosqlite:///./playground.sqlite")
+
+# Older .env files use the sync default (sqlite:///...); map bare dialects
+# to their async drivers instead of failing at import.
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+}
+_url = make_url(DB_URL)
+if _url.drivername in ASYNC_DRIVERS:
+    DB_URL = _url.set(
+        drivername=ASYNC_DRIVERS[_url.drivername]
+    ).render_as_string(hide_password=False)
+
+if DB_URL.startswith("sqlite"):
+    engine_options = {}
+elif os.getenv("DB_NULL_POOL"):
+    # Pooling is left to PgBouncer (transaction mode), which can't keep
+    # prepared statements across transactions. SQLAlchemy still prepares
+    # them, so give each a unique name instead of asyncpg's per-connection
+    # counter, which clashes on PgBouncer's shared server connections.
+    engine_options = {
+        "poolclass": NullPool,
+        "connect_args": (
+            {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: (
+                    f"__asyncpg_{uuid4()}__"
+                ),
+            }
+            if "+asyncpg" in DB_URL else {}
+        ),
+    }
+else:
+    engine_options = {
+        "pool_size": 20,
+        "max_overflow": 10,
+        "pool_timeout": 30,
+        "pool_pre_ping": True,
+        "pool_recycle": 3600,
+    }
+
+engine = create_async_engine(DB_URL, **engine_options)
 
-engine = create_engine(
-    os.getenv("DB_URL", "sqlite:///./playground.sqlite")
+# Dialect-specific INSERT, so routes can use ON CONFLICT ... RETURNING.
+insert = (
+    postgresql.insert
+    if engine.dialect.name == "postgresql"
+    else sqlite.insert
 )
 
 
-def get_session():
-    with Session(engine) as session:
+async def get_session():
+    async with AsyncSession(engine, expire_on_commit=False) as session:
         yield session
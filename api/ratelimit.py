@@ -0,0 +1,30 @@
+import os
+
+from slowapi import Limiter
+from starlette.requests import Request
+
+
+def get_client_address(request: Request) -> str:
+    """Rate limit key for the client behind the router.
+
+    The playground runs behind a single proxy (Heroku's router), so every
+    connection comes from the proxy itself. The right-most
+    `X-Forwarded-For` entry is the one the proxy appended; earlier entries
+    are client-supplied and could be used to dodge the limits. The value is
+    only an opaque key, so it isn't parsed or normalized.
+    """
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded:
+        return forwarded.rsplit(",", 1)[-1].strip()
+    return request.client.host if request.client else "anon"
+
+
+# One limiter for every app. Hits are counted per request path (slowapi's
+# default key_style="url"), which includes the mount prefix.
+limiter = Limiter(
+    key_func=get_client_address,
+    storage_uri=os.getenv("REDIS_URL", "memory://"),
+    strategy="moving-window",
+    # If Redis is unreachable, count in memory rather than failing requests.
+    in_memory_fallback_enabled=True,
+)
@@ -0,0 +1,60 @@
+from typing import Any, Union
+
+import orjson
+from fastapi import Response, status
+from pydantic import ConfigDict, TypeAdapter
+
+# Declarative only: shared by the Read/List response models. It matches
+# pydantic's and SQLModel's defaults, and json_body passes from_attributes.
+READ_CONFIG = ConfigDict(
+    from_attributes=True,
+    revalidate_instances="never",
+)
+
+
+def json_body(adapter: TypeAdapter, data: Any) -> bytes:
+    """Validate `data` with a prebuilt adapter and dump it to JSON bytes."""
+    return adapter.dump_json(
+        adapter.validate_python(data, from_attributes=True)
+    )
+
+
+def body_response(
+    body: bytes,
+    status_code: int = status.HTTP_200_OK,
+) -> Response:
+    """Wrap an already encoded JSON body, such as a cached one."""
+    return Response(
+        content=body,
+        status_code=status_code,
+        media_type="application/json",
+    )
+
+
+def json_response(
+    adapter: TypeAdapter,
+    data: Any,
+    status_code: int = status.HTTP_200_OK,
+) -> Response:
+    """Serialize `data` with `json_body` and return it as a Response.
+
+    Returning a Response skips FastAPI's own response_model pass, so routes
+    keep `response_model` only for the OpenAPI schema.
+    """
+    return body_response(json_body(adapter, data), status_code)
+
+
+def error_body(detail: str) -> bytes:
+    """Encode the `{"detail": ...}` body FastAPI uses for HTTPException."""
+    return orjson.dumps({"detail": detail})
+
+
+def error_response(status_code: int, detail: Union[str, bytes]) -> Response:
+    """Return an HTTPException-style error without the raise/handler trip.
+
+    Fixed messages can be encoded once with `error_body` and passed as bytes.
+    """
+    return body_response(
+        detail if isinstance(detail, bytes) else error_body(detail),
+        status_code,
+    )
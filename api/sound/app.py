@@ -2,37 +2,28 @@ import json
 from typing import List, Optional, Annotated
 
 from fastapi import (
-    FastAPI, Request, Response, HTTPException,
+    Request, Response, HTTPException,
     Query, Depends, Path, status,
 )
-from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.staticfiles import StaticFiles
 
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-
-from sqlmodel import (
-    Session, select
-)
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from api.sound.models import (
     Song, Songs,
     FX, FXs,
     SoundData,
 )
+from api.app_factory import make_app
 from api.db import get_session
+from api.ratelimit import limiter
 
-app = FastAPI(
+app = make_app(
     title="Sound API",
     description="An API serving sound files.",
-    docs_url=None,
+    schema_url="/sound/openapi.json",
 )
 
-limiter = Limiter(key_func=get_remote_address)
-# Limiter requires the request to be in the args for your routes!
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 app.mount("/files", StaticFiles(directory="api/sound/files"), name="files")
 
 data = {
@@ -48,15 +39,6 @@ with (
     data["songs"] = json.load(song_file)
 
 
-@app.get("/docs", include_in_schema=False)
-async def swagger_ui_html():
-    return get_swagger_ui_html(
-        title="4Geeks Playground - Sound API",
-        openapi_url="/sound/openapi.json",
-        swagger_favicon_url="/favicon.ico",
-    )
-
-
 @app.get(
     "/effects",
     response_model=FXs
@@ -82,8 +64,8 @@ def get_all_music():
     response_model=SoundData
 )
 @limiter.limit("15/minute")
-def get_all_data(
+async def get_all_data(
     request: Request,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ) -> None:
     return data
@@ -0,0 +1,33 @@
+from starlette.requests import Request
+
+from api.ratelimit import get_client_address
+
+
+def make_request(headers=None, client=("10.0.0.1", 1234)):
+    return Request({
+        "type": "http",
+        "headers": [
+            (k.lower().encode(), v.encode()) for k, v in (headers or {}).items()
+        ],
+        "client": client,
+    })
+
+
+def test_client_address_spoofed_forwarded_for():
+    request = make_request({"X-Forwarded-For": "1.1.1.1, 9.9.9.9"})
+
+    assert get_client_address(request) == "9.9.9.9"
+
+
+def test_client_address_single_forwarded_for():
+    request = make_request({"X-Forwarded-For": "9.9.9.9"})
+
+    assert get_client_address(request) == "9.9.9.9"
+
+
+def test_client_address_without_forwarded_for():
+    assert get_client_address(make_request()) == "10.0.0.1"
+
+
+def test_client_address_without_client():
+    assert get_client_address(make_request(client=None)) == "anon"
@@ -1,33 +1,34 @@
-import os
-
 from typing import List, Optional, Annotated
 
+from cachetools import TTLCache
 from fastapi import (
-    FastAPI, Request, Response, HTTPException,
+    Request, Response,
     Query, Depends, Path, status,
 )
-from fastapi.openapi.docs import get_swagger_ui_html
-
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
+from pydantic import TypeAdapter
 
-from sqlmodel import (
-    Session, select
-)
+from sqlalchemy import Boolean, String, bindparam, delete, update
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from .models import (
     TodoUser, TodoUserRead, TodoUserReadWithItems,
     TodoItem, TodoItemCreate, TodoItemRead, TodoItemUpdate,
     TodoUserList
 )
-from api.db import get_session
+from api.app_factory import make_app
+from api.db import get_session, insert
+from api.ratelimit import limiter
+from api.serializers import (
+    body_response, error_body, error_response, json_body, json_response,
+)
 
 
-app = FastAPI(
+app = make_app(
     title="Todo API",
     description="An API for storing Todo Lists.",
-    docs_url=None,
+    schema_url="/todo/openapi.json",
     openapi_tags=[
         {
             "name": "User operations",
@@ -40,20 +41,54 @@ app = FastAPI(
     ]
 )
 
-limiter = Limiter(key_func=get_remote_address)
-# Limiter requires the request to be in the args for your routes!
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+USER_ADAPTER = TypeAdapter(TodoUserRead)
+USER_LIST_ADAPTER = TypeAdapter(TodoUserList)
+USER_WITH_ITEMS_ADAPTER = TypeAdapter(TodoUserReadWithItems)
+TODO_ADAPTER = TypeAdapter(TodoItemRead)
 
+# Fixed error bodies are encoded once.
+USER_EXISTS = error_body("User already exists.")
 
-@app.get("/docs", include_in_schema=False)
-async def swagger_ui_html():
-    return get_swagger_ui_html(
-        title="4Geeks Playground - Todo API",
-        openapi_url="/todo/openapi.json",
-        swagger_favicon_url="/favicon.ico",
-        # swagger_css_url="/static/swagger-ui.css",
+# Todo routes only know the todo id, so they clear every cached user.
+USER_CACHE = TTLCache(maxsize=10_000, ttl=2.0)
+USER_LIST_CACHE = TTLCache(maxsize=1_000, ttl=2.0)
+
+USERS_PAGE = select(TodoUser.id, TodoUser.name).offset(
+    bindparam("offset")
+).limit(bindparam("limit"))
+USER_BY_NAME = select(TodoUser).where(
+    TodoUser.name == bindparam("user_name")
+)
+USER_WITH_TODOS_BY_NAME = USER_BY_NAME.options(
+    selectinload(TodoUser.todos)
+)
+INSERT_USER = insert(TodoUser).values(
+    name=bindparam("user_name")
+).on_conflict_do_nothing(
+    index_elements=["name"]
+).returning(TodoUser)
+INSERT_USER_TODO = insert(TodoItem).from_select(
+    ["label", "is_done", "user_id"],
+    select(
+        bindparam("label", type_=String),
+        bindparam("is_done", type_=Boolean),
+        TodoUser.id,
+    ).where(TodoUser.name == bindparam("user_name")),
+).returning(TodoItem).execution_options(dml_strategy="raw")
+UPDATE_TODO = update(TodoItem).where(
+    TodoItem.id == bindparam("todo_id")
+).returning(TodoItem).execution_options(dml_strategy="core_only")
+DELETE_USER_TODOS = delete(TodoItem).where(
+    TodoItem.user_id.in_(
+        select(TodoUser.id).where(TodoUser.name == bindparam("user_name"))
     )
+).execution_options(synchronize_session="fetch")
+DELETE_USER = delete(TodoUser).where(
+    TodoUser.name == bindparam("user_name")
+).returning(TodoUser.id).execution_options(synchronize_session="fetch")
+DELETE_TODO = delete(TodoItem).where(
+    TodoItem.id == bindparam("todo_id")
+).returning(TodoItem.id).execution_options(synchronize_session="fetch")
 
 
 @app.post(
@@ -63,7 +98,6 @@ async def swagger_ui_html():
     tags=["User operations"],
     summary="Creates User.",
     description="Creates a new User.",
-    response_class=Response,
     responses={
         201: {
             "description": "User successfully created.",
@@ -84,25 +118,26 @@ async def swagger_ui_html():
     },
 )
 @limiter.limit("15/minute")
-def create_user(
+async def create_user(
     user_name: Annotated[str, Path(title="username")],
     request: Request,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ) -> None:
-    user_exists = session.exec(select(TodoUser).where(
-        TodoUser.name == user_name)).first()
-    if user_exists:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="User already exists."
+    db_user = (await session.exec(
+        INSERT_USER,
+        params={"user_name": user_name},
+    )).scalar_one_or_none()
+    if db_user is None:
+        return error_response(
+            status.HTTP_400_BAD_REQUEST,
+            USER_EXISTS
         )
-    db_user = TodoUser.model_validate({
-        "name": user_name
-    })
-    session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
-    return db_user
+    await session.commit()
+    USER_CACHE.pop(user_name, None)
+    USER_LIST_CACHE.clear()
+    return json_response(
+        USER_ADAPTER, db_user, status.HTTP_201_CREATED
+    )
 
 
 @app.delete(
@@ -131,21 +166,24 @@ def create_user(
     },
 )
 @limiter.limit("15/minute")
-def delete_user(
+async def delete_user(
     request: Request,
     user_name: Annotated[str, Path(title="username")],
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
 ):
-    user = session.exec(select(TodoUser).where(
-        TodoUser.name == user_name)
-    ).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"User {user_name} doesn't exist."
+    await session.exec(DELETE_USER_TODOS, params={"user_name": user_name})
+    deleted = (await session.exec(
+        DELETE_USER,
+        params={"user_name": user_name},
+    )).first()
+    if deleted is None:
+        return error_response(
+            status.HTTP_400_BAD_REQUEST,
+            f"User {user_name} doesn't exist."
         )
-    session.delete(user)
-    session.commit()
+    await session.commit()
+    USER_CACHE.pop(user_name, None)
+    USER_LIST_CACHE.clear()
     return Response(
         status_code=status.HTTP_204_NO_CONTENT
     )
@@ -157,7 +195,6 @@ def delete_user(
     tags=["User operations"],
     summary="Gets all Users",
     description="Gets a lists of users",
-    response_class=Response,
     responses={
         200: {
             "description": "List of users.",
@@ -172,17 +209,21 @@ def delete_user(
     },
 )
 @limiter.limit("120/minute")
-def read_users(
+async def read_users(
     request: Request,
     offset: int = 0,
     limit: int = Query(default=100, le=100),
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
-    return {
-        "users": session.exec(
-            select(TodoUser).offset(offset).limit(limit)
-        ).all()
-    }
+    key = (offset, limit)
+    if (body := USER_LIST_CACHE.get(key)) is None:
+        body = USER_LIST_CACHE[key] = json_body(USER_LIST_ADAPTER, {
+            "users": (await session.exec(
+                USERS_PAGE,
+                params={"offset": offset, "limit": limit},
+            )).all()
+        })
+    return body_response(body)
 
 
 @app.get(
@@ -191,7 +232,6 @@ def read_users(
     tags=["User operations"],
     summary="Gets a User and its items",
     description="Gets a User and its items by ID.",
-    response_class=Response,
     responses={
         200: {
             "description": "User found.",
@@ -212,20 +252,25 @@ def read_users(
     },
 )
 @limiter.limit("120/minute")
-def read_user(
+async def read_user(
     request: Request,
     user_name: Annotated[str, Path(title="username")],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
-    user = session.exec(select(TodoUser).where(
-        TodoUser.name == user_name)
-    ).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"User {user_name} doesn't exist."
+    if (body := USER_CACHE.get(user_name)) is None:
+        user = (await session.exec(
+            USER_WITH_TODOS_BY_NAME,
+            params={"user_name": user_name},
+        )).first()
+        if not user:
+            return error_response(
+                status.HTTP_404_NOT_FOUND,
+                f"User {user_name} doesn't exist."
+            )
+        body = USER_CACHE[user_name] = json_body(
+            USER_WITH_ITEMS_ADAPTER, user
         )
-    return user
+    return body_response(body)
 
 
 @app.post(
@@ -235,7 +280,6 @@ def read_user(
     tags=["Todo operations"],
     summary="Creates a Todo item",
     description="Creates a Todo item.",
-    response_class=Response,
     responses={
         201: {
             "description": "Todo item successfully created.",
@@ -256,28 +300,26 @@ def read_user(
     },
 )
 @limiter.limit("60/minute")
-def create_user_todo(
+async def create_user_todo(
     request: Request,
     user_name: Annotated[str, Path(title="username")],
     todo_item: TodoItemCreate,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
-    user = session.exec(select(TodoUser).where(
-        TodoUser.name == user_name)
-    ).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"""User "{user_name}" doesn't exist."""
+    db_todo = (await session.exec(
+        INSERT_USER_TODO,
+        params={**todo_item.model_dump(), "user_name": user_name},
+    )).first()
+    if db_todo is None:
+        return error_response(
+            status.HTTP_404_NOT_FOUND,
+            f"""User "{user_name}" doesn't exist."""
         )
-    db_todo = TodoItem.model_validate({
-        **todo_item.model_dump(),
-        "user_id": user.id
-    })
-    session.add(db_todo)
-    session.commit()
-    session.refresh(db_todo)
-    return db_todo
+    await session.commit()
+    USER_CACHE.pop(user_name, None)
+    return json_response(
+        TODO_ADAPTER, db_todo, status.HTTP_201_CREATED
+    )
 
 
 @app.put(
@@ -286,7 +328,6 @@ def create_user_todo(
     tags=["Todo operations"],
     summary="Updates a Todo item",
     description="Updates a Todo item by ID.",
-    response_class=Response,
     responses={
         404: {
             "description": "Todo not found.",
@@ -299,25 +340,29 @@ def create_user_todo(
     },
 )
 @limiter.limit("120/minute")
-def update_user_todo(
+async def update_user_todo(
     request: Request,
     todo_id: Annotated[int, Path(title="username")],
     todo_data: TodoItemUpdate,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
-    todo = session.get(TodoItem, todo_id)
-    if not todo:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Todo #{todo_id} doesn't exist."
+    # Columns are NOT NULL, so explicit nulls are dropped like unset fields.
+    changes = todo_data.model_dump(exclude_unset=True, exclude_none=True)
+    if changes:
+        todo = (await session.exec(
+            UPDATE_TODO.values(**changes),
+            params={"todo_id": todo_id},
+        )).first()
+    else:
+        todo = await session.get(TodoItem, todo_id)
+    if todo is None:
+        return error_response(
+            status.HTTP_404_NOT_FOUND,
+            f"Todo #{todo_id} doesn't exist."
         )
-    for k, v in todo_data:
-        if v is not None:
-            setattr(todo, k, v)
-    session.add(todo)
-    session.commit()
-    session.refresh(todo)
-    return todo
+    await session.commit()
+    USER_CACHE.clear()
+    return json_response(TODO_ADAPTER, todo)
 
 
 @app.delete(
@@ -346,19 +391,22 @@ def update_user_todo(
     },
 )
 @limiter.limit("120/minute")
-def delete_user_todo(
+async def delete_user_todo(
     request: Request,
     todo_id: Annotated[int, Path(title="todo id")],
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ):
-    todo = session.get(TodoItem, todo_id)
-    if not todo:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Todo #{todo_id} doesn't exist."
+    deleted = (await session.exec(
+        DELETE_TODO,
+        params={"todo_id": todo_id},
+    )).first()
+    if deleted is None:
+        return error_response(
+            status.HTTP_404_NOT_FOUND,
+            f"Todo #{todo_id} doesn't exist."
         )
-    session.delete(todo)
-    session.commit()
+    await session.commit()
+    USER_CACHE.clear()
     return Response(
         status_code=status.HTTP_204_NO_CONTENT
     )
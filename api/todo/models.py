@@ -5,6 +5,8 @@ from sqlmodel import (
 )
 from pydantic import BaseModel
 
+from api.serializers import READ_CONFIG
+
 
 class TodoUserBase(SQLModel):
     name: str = Field(
@@ -29,6 +31,8 @@ class TodoUserCreate(TodoUserBase):
 
 
 class TodoUserRead(TodoUserBase):
+    model_config = READ_CONFIG
+
     id: int
     name: str
 
@@ -45,7 +49,8 @@ class TodoItem(TodoItemBase, table=True):
     )
     label: str
     user_id: int = Field(
-        foreign_key="todouser.id"
+        foreign_key="todouser.id",
+        index=True,
     )
     user: Optional["TodoUser"] = Relationship(back_populates="todos")
 
@@ -55,6 +60,8 @@ class TodoItemCreate(TodoItemBase):
 
 
 class TodoItemRead(TodoItemBase):
+    model_config = READ_CONFIG
+
     id: int
     label: str
     is_done: bool
@@ -68,14 +75,20 @@ class TodoItemUpdate(TodoItemBase):
 # Models with relationships
 
 class TodoUserReadWithItems(TodoUserBase):
+    model_config = READ_CONFIG
+
     todos: List["TodoItemRead"]
 
 
 # Group models
 
 class TodoUserList(BaseModel):
+    model_config = READ_CONFIG
+
     users: List[TodoUserRead]
 
 
 class TodoItemList(BaseModel):
+    model_config = READ_CONFIG
+
     todos: List[TodoItem]
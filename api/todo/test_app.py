@@ -1,40 +1,54 @@
 import pytest
-from fastapi.testclient import TestClient
-from sqlmodel import (
-    Session, SQLModel, create_engine, select
-)
+from httpx import ASGITransport, AsyncClient
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.pool import StaticPool
 
 from api.db import get_session
-from api.todo.app import app
+from api.ratelimit import limiter
+from api.todo.app import app, USER_CACHE, USER_LIST_CACHE
 from api.todo.models import (
     TodoUser, TodoItem
 )
 
 
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
 @pytest.fixture(name="session")
-def session_fixture():
-    engine = create_engine(
-        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+async def session_fixture():
+    engine = create_async_engine(
+        "sqlite+aiosqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
     )
-    SQLModel.metadata.create_all(engine)
-    with Session(engine) as session:
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
         yield session
+    await engine.dispose()
 
 
 @pytest.fixture(name="client")
-def client_fixture(session: Session):
+async def client_fixture(session: AsyncSession):
     def get_session_override():
         return session
 
     app.dependency_overrides[get_session] = get_session_override
-    client = TestClient(app)
-    yield client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        yield client
     app.dependency_overrides.clear()
+    USER_CACHE.clear()
+    USER_LIST_CACHE.clear()
+    limiter.reset()
 
 
-def test_create_user(client: TestClient):
-    response = client.post(
+async def test_create_user(client: AsyncClient):
+    response = await client.post(
         "/users/grizelle"
     )
     data = response.json()
@@ -44,16 +58,16 @@ def test_create_user(client: TestClient):
     assert data["id"] is not None
 
 
-def test_get_users(session: Session, client: TestClient):
+async def test_get_users(session: AsyncSession, client: AsyncClient):
     users = [
         TodoUser(name="grizelle"),
         TodoUser(name="sombra"),
     ]
     for user in users:
         session.add(user)
-    session.commit()
+    await session.commit()
 
-    resp = client.get(
+    resp = await client.get(
         "/users"
     )
     data = resp.json()
@@ -65,12 +79,35 @@ def test_get_users(session: Session, client: TestClient):
     assert "sombra" in [user["name"] for user in data["users"]]
 
 
-def test_post_todos(session: Session, client: TestClient):
+async def test_get_user(session: AsyncSession, client: AsyncClient):
     sombra = TodoUser(name="sombra")
     session.add(sombra)
-    session.commit()
+    await session.commit()
+    session.add(TodoItem(label="Nap", user_id=sombra.id))
+    await session.commit()
+
+    resp = await client.get(
+        "/users/sombra"
+    )
+    data = resp.json()
+
+    assert resp.status_code == 200
+    assert data["name"] == "sombra"
+    assert [todo["label"] for todo in data["todos"]] == ["Nap"]
+
+    resp = await client.get(
+        "/users/grizelle"
+    )
+
+    assert resp.status_code == 404
 
-    resp = client.post(
+
+async def test_post_todos(session: AsyncSession, client: AsyncClient):
+    sombra = TodoUser(name="sombra")
+    session.add(sombra)
+    await session.commit()
+
+    resp = await client.post(
         "/todos/sombra",
         json={
             "label": "Meow for food at 6 AM",
@@ -79,9 +116,10 @@ def test_post_todos(session: Session, client: TestClient):
     )
     data = resp.json()
 
-    sombra = session.exec(select(TodoUser).where(
+    sombra = (await session.exec(select(TodoUser).where(
         TodoUser.name == "sombra")
-    ).first()
+    )).first()
+    await session.refresh(sombra, ["todos"])
 
     assert resp.status_code == 201
     assert len(sombra.todos) == 1
@@ -90,22 +128,35 @@ def test_post_todos(session: Session, client: TestClient):
     assert data["id"] is not None
 
 
-def test_put_todos(session: Session, client: TestClient):
+async def test_post_todos_missing_user(session: AsyncSession, client: AsyncClient):
+    resp = await client.post(
+        "/todos/sombra",
+        json={
+            "label": "Meow for food at 6 AM"
+        }
+    )
+    todos = (await session.exec(select(TodoItem))).all()
+
+    assert resp.status_code == 404
+    assert len(todos) == 0
+
+
+async def test_put_todos(session: AsyncSession, client: AsyncClient):
     sombra = TodoUser(name="sombra")
     session.add(sombra)
-    session.commit()
-    session.refresh(sombra)
+    await session.commit()
+    await session.refresh(sombra)
     todo = TodoItem(
         label="Hello, world!",
         is_done=False,
         user_id=sombra.id
     )
     session.add(todo)
-    session.commit()
-    session.refresh(todo)
-    session.refresh(sombra)
+    await session.commit()
+    await session.refresh(todo)
+    await session.refresh(sombra)
 
-    resp = client.put(
+    resp = await client.put(
         f"/todos/{todo.id}",
         json={
             "label": "Meow for food at 6 AM",
@@ -114,7 +165,7 @@ def test_put_todos(session: Session, client: TestClient):
     )
     data = resp.json()
 
-    todo = session.get(TodoItem, todo.id)
+    todo = await session.get(TodoItem, todo.id)
 
     assert resp.status_code == 200
     assert data["label"] == "Meow for food at 6 AM"
@@ -122,69 +173,117 @@ def test_put_todos(session: Session, client: TestClient):
     assert data["id"] == todo.id
 
 
-def test_delete_todos(session: Session, client: TestClient):
+async def test_put_todos_partial(session: AsyncSession, client: AsyncClient):
+    sombra = TodoUser(name="sombra")
+    session.add(sombra)
+    await session.commit()
+    todo = TodoItem(
+        label="Hello, world!",
+        is_done=False,
+        user_id=sombra.id
+    )
+    session.add(todo)
+    await session.commit()
+
+    resp = await client.put(
+        f"/todos/{todo.id}",
+        json={
+            "is_done": True
+        }
+    )
+    data = resp.json()
+
+    assert resp.status_code == 200
+    assert data["label"] == "Hello, world!"
+    assert data["is_done"] == True
+
+    resp = await client.put(
+        "/todos/123",
+        json={
+            "is_done": True
+        }
+    )
+
+    assert resp.status_code == 404
+
+
+async def test_delete_todos(session: AsyncSession, client: AsyncClient):
     sombra = TodoUser(name="sombra")
     session.add(sombra)
-    session.commit()
-    session.refresh(sombra)
+    await session.commit()
+    await session.refresh(sombra)
     todo = TodoItem(
         label="Hello, world!",
         is_done=False,
         user_id=sombra.id
     )
     session.add(todo)
-    session.commit()
-    session.refresh(todo)
-    session.refresh(sombra)
+    await session.commit()
+    await session.refresh(todo)
+    await session.refresh(sombra)
 
-    resp = client.delete(
+    resp = await client.delete(
         f"/todos/{todo.id}"
     )
 
-    todo = session.get(TodoItem, todo.id)
+    todo = await session.get(TodoItem, todo.id)
 
     assert resp.status_code == 204
     assert todo is None
 
 
-def test_delete_user(session: Session, client: TestClient):
+async def test_delete_user(session: AsyncSession, client: AsyncClient):
     sombra = TodoUser(name="sombra")
     session.add(sombra)
-    session.commit()
-    session.refresh(sombra)
+    await session.commit()
+    await session.refresh(sombra)
     todo = TodoItem(
         label="Hello, world!",
         is_done=False,
         user_id=sombra.id
     )
     session.add(todo)
-    session.commit()
-    session.refresh(todo)
-    session.refresh(sombra)
+    await session.commit()
+    await session.refresh(todo)
+    await session.refresh(sombra)
 
     grizelle = TodoUser(name="grizelle")
     session.add(grizelle)
-    session.commit()
-    session.refresh(grizelle)
+    await session.commit()
+    await session.refresh(grizelle)
     todo = TodoItem(
         label="Hello, world!",
         is_done=False,
         user_id=grizelle.id
     )
     session.add(todo)
-    session.commit()
-    session.refresh(todo)
-    session.refresh(grizelle)
+    await session.commit()
+    await session.refresh(todo)
+    await session.refresh(grizelle)
 
-    resp = client.delete(
+    resp = await client.delete(
         "/users/sombra"
     )
 
-    sombra = session.get(TodoUser, sombra.id)
-    todos = session.exec(select(TodoItem)).all()
-    users = session.exec(select(TodoUser)).all()
+    sombra = await session.get(TodoUser, sombra.id)
+    todos = (await session.exec(select(TodoItem))).all()
+    users = (await session.exec(select(TodoUser))).all()
 
     assert resp.status_code == 204
     assert sombra is None
     assert len(todos) == 1
     assert len(users) == 1
+
+
+async def test_delete_user_missing(client: AsyncClient):
+    resp = await client.delete("/users/missing")
+
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == "User missing doesn't exist."
+
+
+async def test_delete_todos_missing(client: AsyncClient):
+    resp = await client.delete("/todos/999")
+
+    assert resp.status_code == 404
+    assert resp.json()["detail"] == "Todo #999 doesn't exist."
@@ -5,11 +5,11 @@ from fastapi.responses import HTMLResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 
 import api
+from api.ratelimit import limiter
 
 template = None
 with open("./static/index.html", "r") as f:
@@ -36,11 +36,15 @@ for mod in api.__all__:
     subapp.contact = {
         "email": "info@4geeks.com"
     }
+    # Build the schema once up front instead of on the first request. That
+    # skips the mount root_path FastAPI would add to "servers" on the first
+    # /openapi.json hit, so set it here or "Try it out" misses the prefix.
+    subapp.servers = [{"url": f"/{name}"}]
+    subapp.openapi()
     app.mount(f"""/{name}""", subapp, name)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-limiter = Limiter(key_func=get_remote_address)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
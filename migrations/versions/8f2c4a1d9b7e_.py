@@ -0,0 +1,32 @@
+"""index foreign keys
+
+Revision ID: 8f2c4a1d9b7e
+Revises: 36d54be01533
+Create Date: 2026-10-14 10:12:41.118503
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f2c4a1d9b7e'
+down_revision: Union[str, None] = '36d54be01533'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY can't run inside a transaction on Postgres.
+    with op.get_context().autocommit_block():
+        op.create_index(op.f('ix_contact_agenda_id'), 'contact', ['agenda_id'], unique=False, postgresql_concurrently=True)
+        op.create_index(op.f('ix_todoitem_user_id'), 'todoitem', ['user_id'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(op.f('ix_todoitem_user_id'), table_name='todoitem', postgresql_concurrently=True)
+        op.drop_index(op.f('ix_contact_agenda_id'), table_name='contact', postgresql_concurrently=True)
@@ -0,0 +1,19 @@
+import re
+
+from fastapi.testclient import TestClient
+
+import api
+from main import app
+
+client = TestClient(app)
+
+
+def test_mounted_openapi_servers():
+    for mod in api.__all__:
+        if re.search("pycache", mod.__name__):
+            continue
+        name = re.sub(r"api\.", "", mod.__name__)
+        response = client.get(f"/{name}/openapi.json")
+
+        assert response.status_code == 200
+        assert response.json()["servers"] == [{"url": f"/{name}"}]
@@ -19,54 +19,36 @@ __all__ = (
     app = f"""from typing import List, Optional, Annotated
 
 from fastapi import (
-    FastAPI, Request, Response, HTTPException,
+    Request, Response, HTTPException,
     Query, Depends, Path, status,
 )
-from fastapi.openapi.docs import get_swagger_ui_html
 
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-
-from sqlmodel import (
-    Session, select
-)
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from api.{f_name}.models import (
     HelloWorldRead
 )
+from api.app_factory import make_app
 from api.db import get_session
+from api.ratelimit import limiter
 
-app = FastAPI(
+app = make_app(
     title="{name.title()} API",
     description="An API that you should describe.",
-    docs_url=None,
+    schema_url="/{f_name}/openapi.json",
 )
 
-limiter = Limiter(key_func=get_remote_address)
-# Limiter requires the request to be in the args for your routes!
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-
-
-@app.get("/docs", include_in_schema=False)
-async def swagger_ui_html():
-    return get_swagger_ui_html(
-        title="4Geeks Playground - {name.title()} API",
-        openapi_url="/{f_name}/openapi.json",
-        swagger_favicon_url="/favicon.ico",
-    )
-
 
 @app.get(
-    "/hello/",
+    "/hello",
     response_model=HelloWorldRead,
     tags=["User operations"],
 )
 @limiter.limit("15/minute")
-def hello_world(
+async def hello_world(
     request: Request,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_session)
 ) -> None:
     hello_world = HelloWorldRead(message="Hello, world!")
     return hello_world
@@ -101,39 +83,49 @@ class HelloWorldRead(HelloWorldBase):
 
 """
     tests = f"""import pytest
-from fastapi.testclient import TestClient
-from sqlmodel import (
-    Session, SQLModel, create_engine
-)
+from httpx import ASGITransport, AsyncClient
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.pool import StaticPool
 
 from api.db import get_session
 from api.{f_name}.app import app
 
 
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
 @pytest.fixture(name="session")
-def session_fixture():
-    engine = create_engine(
-        "sqlite://", connect_args={'{"check_same_thread": False}'}, poolclass=StaticPool
+async def session_fixture():
+    engine = create_async_engine(
+        "sqlite+aiosqlite://", connect_args={'{"check_same_thread": False}'}, poolclass=StaticPool
     )
-    SQLModel.metadata.create_all(engine)
-    with Session(engine) as session:
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
         yield session
+    await engine.dispose()
 
 
 @pytest.fixture(name="client")
-def client_fixture(session: Session):
+async def client_fixture(session: AsyncSession):
     def get_session_override():
         return session
 
     app.dependency_overrides[get_session] = get_session_override
-    client = TestClient(app)
-    yield client
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        yield client
     app.dependency_overrides.clear()
 
 
-def test_hello_world(client: TestClient):
-    response = client.get(
+async def test_hello_world(client: AsyncClient):
+    response = await client.get(
         "/hello"
     )
     data = response.json()
@@ -168,10 +160,10 @@ def reset_db():
         if f_name != ".gitkeep":
             os.remove(f"./migrations/versions/{f_name}")
             pass
-    db_name = os.getenv("DB_URL", "sqlite:///./playground.sqlite")
-    if re.match(r"sqlite\:", db_name):
+    db_name = os.getenv("DB_URL", "sqlite+aiosqlite:///./playground.sqlite")
+    if re.match(r"sqlite(\+\w+)?\:", db_name):
         db_name = re.sub(
-            r"(^sqlite|/\.|[\:\/])",
+            r"(^sqlite(\+\w+)?|/\.|[\:\/])",
             "",
             db_name
         )